@@ -0,0 +1,70 @@
+#
+# VaxPress
+#
+# Copyright 2023 Seoul National University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# “Software”), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR
+# THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+# Compiled kernels for post-processing predicted secondary structures.
+# Numba is optional and is installed with the 'fast' extra
+# (pip install 'vaxpress[fast]'); callers check NUMBA_AVAILABLE and fall
+# back to the pure Python implementations when it is not installed.
+
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def find_stems(buf):
+        # Same scan as FoldEvaluator.find_stems, but the pairs are emitted
+        # into flat arrays; a new stem starts at every index in group_starts.
+        n = len(buf)
+        stack = np.empty(n, np.int32)
+        peers = np.empty(n, np.int32)
+        closes = np.empty(n, np.int32)
+        group_starts = np.empty(n, np.int32)
+        sp = npairs = ngroups = 0
+
+        for i in range(n):
+            c = buf[i]
+            if c == 40: # '('
+                stack[sp] = i
+                sp += 1
+            elif c == 41: # ')'
+                if sp == 0:
+                    raise ValueError('Unbalanced parentheses in structure')
+                sp -= 1
+                peer = stack[sp]
+                if (npairs == 0 or peer + 1 != peers[npairs - 1] or
+                        i - 1 != closes[npairs - 1]):
+                    group_starts[ngroups] = npairs
+                    ngroups += 1
+                peers[npairs] = peer
+                closes[npairs] = i
+                npairs += 1
+
+        return peers[:npairs], closes[:npairs], group_starts[:ngroups]
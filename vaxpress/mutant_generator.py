@@ -25,6 +25,7 @@
 
 from Bio.Data import CodonTable
 from collections import namedtuple
+from functools import lru_cache
 import pandas as pd
 import numpy as np
 from . import lineardesign
@@ -34,9 +35,16 @@ from typing import Union
 STOP = '*'
 MutationChoice = namedtuple('MutationChoice', ['pos', 'altcodon'])
 
+@lru_cache(maxsize=1024)
+def find_loop_positions(structure: str) -> frozenset:
+    # All mutants of a parent share its folding, so the unpaired codon
+    # positions are memoized by structure instead of being rescanned for
+    # every mutant. The folding dicts themselves are shared with the caches
+    # and scorers, and are left untouched.
+    return frozenset(i // 3 for i, code in enumerate(structure) if code == '.')
+
 class MutantGenerator(Sequence):
 
-    cdsseq = None
     initial_codons = None
 
     def __init__(self, cdsseq: Union[str, list], random_state: np.random.RandomState,
@@ -88,11 +96,14 @@ class MutantGenerator(Sequence):
         self.initial_codons[omitstart:] = [
             rseq[i*3:i*3+3] for i in range(len(prot_om))]
 
+    @staticmethod
+    def get_loop_positions(folding: dict) -> frozenset:
+        return find_loop_positions(folding['folding'])
+
     def calc_probabilities(self, choices: list[MutationChoice],
                            folding: dict) -> np.ndarray:
         minimum_position = self.boost_loop_mutations_start
-        loop_positions = set([i // 3 for i, code in enumerate(folding['folding'])
-                              if code == '.'])
+        loop_positions = self.get_loop_positions(folding)
 
         weightmap = [1, self.boost_loop_mutations_weight]
         probs = [weightmap[mut.pos in loop_positions and mut.pos >= minimum_position]
@@ -132,8 +143,7 @@ class MutantGenerator(Sequence):
         if choices is None:
             choices = self.choices
 
-        loop_positions = set([i // 3 for i, code in enumerate(fold['folding'])
-                              if code == '.'])
+        loop_positions = self.get_loop_positions(fold)
 
         for choice in self.choices:
             if choice.pos not in loop_positions:
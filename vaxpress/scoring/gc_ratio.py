@@ -29,10 +29,10 @@ import numpy as np
 def gc_content_sliding_window(seq, winsize, stride):
     chars = np.frombuffer(seq.encode(), dtype=np.uint8)
     isgc = ((chars == ord('G')) + (chars == ord('C')))
-    gc = []
-    for i in range(0, len(chars) - winsize + 1, stride):
-        gc.append(np.mean(isgc[i:i+winsize]))
-    return np.array(gc)
+    gccum = np.zeros(len(chars) + 1, dtype=np.int32)
+    np.cumsum(isgc, dtype=np.int32, out=gccum[1:])
+    starts = np.arange(0, len(chars) - winsize + 1, stride)
+    return (gccum[starts + winsize] - gccum[starts]) / winsize
 
 def compute_gc_penalty(seq, winsize, stride):
     gc = gc_content_sliding_window(seq, winsize, stride)
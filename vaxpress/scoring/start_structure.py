@@ -59,7 +59,7 @@ class StartCodonStructureFitness(ScoringFunction):
         for fold in foldings:
             start_structure = fold['folding'][start_at:(start_at + self.width)]
 
-            start_folded = start_structure.count('(') + start_structure.count(')')
+            start_folded = len(start_structure) - start_structure.count('.')
             metrics.append(start_folded)
             scores.append(start_folded * self.weight)
 
@@ -67,5 +67,5 @@ class StartCodonStructureFitness(ScoringFunction):
 
     def annotate_sequence(self, seq, folding):
         start_structure = folding['folding'][:self.width]
-        start_folded = start_structure.count('(') + start_structure.count(')')
+        start_folded = len(start_structure) - start_structure.count('.')
         return {'start_str': start_folded}
@@ -3,11 +3,48 @@
 
 from Bio.Data import CodonTable
 import pandas as pd
+import re
+from functools import lru_cache
 from typing import Union
 
 STOP = "*"
 
+@lru_cache(maxsize=None)
+def load_codon_table(codon_table: str) -> tuple:
+    # Sequence objects are created for every candidate during scoring, so the
+    # lookup tables are built once per codon table and shared read-only.
+    table_var_name = f'{codon_table}_rna_table'
+    if not hasattr(CodonTable, table_var_name):
+        raise ValueError(f'Invalid codon table name: {codon_table}')
+
+    table = getattr(CodonTable, table_var_name)
+
+    codon_frame = pd.DataFrame(
+        list(table.forward_table.items()) +
+        [[stopcodon, STOP] for stopcodon in table.stop_codons],
+        columns = ['codon', 'aa']
+    )
+
+    synonymous_codons, aa2codons, codon2aa = {}, {}, {}
+
+    for aa, codons in codon_frame.groupby('aa'):
+        codons = set(codons['codon'])
+        aa2codons[aa] = codons
+
+        for codon in codons:
+            synonymous_codons[codon] = sorted(codons - set([codon]))
+            codon2aa[codon] = aa
+
+    return table, synonymous_codons, aa2codons, codon2aa
+
 class Sequence:
+
+    __slots__ = ('cdsseq', 'codons', '_5utr', '_3utr', 'codon_table',
+                 'synonymous_codons', 'aa2codons', 'codon2aa')
+
+    # Shortest run of whole codons ending with the first in-frame stop codon
+    _INFRAME_STOP_RE = re.compile(r'(?:...)*?(?:UAA|UAG|UGA)', re.DOTALL)
+
     def __init__(self, cdsseq: Union[str, list], codon_table: str = 'standard', 
                  is_protein: bool = False, is_cds = False):
         self.initialize_codon_table(codon_table)
@@ -33,46 +70,21 @@ class Sequence:
         if not self.codons:
             self.codons = [self.cdsseq[i:i+3] for i in range(0, len(self.cdsseq), 3)]
     
-    @staticmethod
-    def truncate(rawseq: str) -> str:
+    @classmethod
+    def truncate(cls, rawseq: str) -> str:
         start = rawseq.find('AUG')
-        reading_frame = [rawseq[i:i+3] for i in range(start, len(rawseq), 3)]
-        min_stop_index = len(reading_frame)
-        stop_codons = ['UAA', 'UAG', 'UGA']
-        for stop in stop_codons:
-            try:
-                stop_index = reading_frame.index(stop)
-                if min_stop_index > stop_index:
-                    min_stop_index = stop_index
-            except ValueError:
-                continue
-        reading_frame = reading_frame[:(min_stop_index + 1)]
+        if start < 0:
+            raise ValueError("No start codon (AUG) found in the sequence!")
+        stop = cls._INFRAME_STOP_RE.match(rawseq, start)
+        end = stop.end() if stop is not None else len(rawseq)
+        reading_frame = [rawseq[i:i+3] for i in range(start, end, 3)]
         _5utr = rawseq[:start]
-        _3utr = rawseq[start + 3*(min_stop_index + 1):]
-        return _5utr, ''.join(reading_frame), reading_frame, _3utr
+        _3utr = rawseq[end:]
+        return _5utr, rawseq[start:end], reading_frame, _3utr
 
     def initialize_codon_table(self, codon_table: str) -> None:
-        table_var_name = f'{codon_table}_rna_table'
-        if not hasattr(CodonTable, table_var_name):
-            raise ValueError(f'Invalid codon table name: {codon_table}')
-
-        self.codon_table = getattr(CodonTable, table_var_name)
-
-        codon_frame = pd.DataFrame(
-            list(self.codon_table.forward_table.items()) +
-            [[stopcodon, STOP] for stopcodon in self.codon_table.stop_codons],
-            columns = ['codon', 'aa']
-        )
-
-        self.synonymous_codons, self.aa2codons, self.codon2aa = {}, {}, {}
-
-        for aa, codons in codon_frame.groupby('aa'):
-            codons = set(codons['codon'])
-            self.aa2codons[aa] = codons
-
-            for codon in codons:
-                self.synonymous_codons[codon] = sorted(codons - set([codon]))
-                self.codon2aa[codon] = aa
+        (self.codon_table, self.synonymous_codons, self.aa2codons,
+         self.codon2aa) = load_codon_table(codon_table)
 
     def backtranslate(self, proteinseq: str) -> str:
         return ''.join(next(iter(self.aa2codons[aa])) for aa in proteinseq)
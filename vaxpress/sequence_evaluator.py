@@ -24,19 +24,41 @@
 #
 
 import sys
-import re
-import pylru
+import traceback
+import numpy as np
 from tqdm import tqdm
 from concurrent import futures
-from collections import Counter
+from collections import OrderedDict
 from .log import hbar_stars, log
+from . import _fold_native
+
+class LRUCache(OrderedDict):
+
+    # Bounded mapping that evicts the least recently used entry. Unlike
+    # pylru's linked list kept in Python objects, the recency order is
+    # maintained by the C implementation of OrderedDict.
+
+    def __init__(self, size):
+        super().__init__()
+        self.size = size
+
+    def __getitem__(self, key):
+        self.move_to_end(key)
+        return OrderedDict.__getitem__(self, key)
+
+    def __setitem__(self, key, value):
+        OrderedDict.__setitem__(self, key, value)
+        self.move_to_end(key)
+        if len(self) > self.size:
+            self.popitem(last=False)
 
 
 class FoldEvaluator:
 
+    __slots__ = ('engine', '_fold')
+
     def __init__(self, engine: str):
         self.engine = engine
-        self.pat_find_loops = re.compile(r'\.{2,}')
         self.initialize()
 
     def initialize(self):
@@ -59,9 +81,8 @@ class FoldEvaluator:
 
     def __call__(self, seq):
         folding, mfe = self._fold(seq)
-        stems = self.find_stems(folding)
-        folding, stems = self.unfold_unstable_structure(folding, stems)
-        loops = dict(Counter(map(len, self.pat_find_loops.findall(folding))))
+        folding, stems = self.find_stable_stems(folding)
+        loops = self.count_loops(folding)
 
         return {
             'folding': folding,
@@ -72,24 +93,74 @@ class FoldEvaluator:
 
     @staticmethod
     def find_stems(structure):
+        if _fold_native.NUMBA_AVAILABLE:
+            _, *stemarrays = FoldEvaluator._native_stems(structure)
+            return FoldEvaluator.stems_to_lists(*stemarrays)
+
         stack = []
         stemgroups = []
+        last_peer = last_close = -2 # the most recent pair, kept as scalars
 
         for i, s in enumerate(structure):
             if s == '(':
                 stack.append(i)
             elif s == ')':
-                assert len(stack) >= 1
                 peer = stack.pop()
-                if (stemgroups and peer + 1 == stemgroups[-1][0][-1] and
-                        i - 1 == stemgroups[-1][1][-1]):
-                    stemgroups[-1][0].append(peer)
-                    stemgroups[-1][1].append(i)
+                if peer + 1 == last_peer and i - 1 == last_close:
+                    p5, p3 = stemgroups[-1]
+                    p5.append(peer)
+                    p3.append(i)
                 else:
                     stemgroups.append(([peer], [i]))
+                last_peer, last_close = peer, i
 
         return stemgroups
 
+    @staticmethod
+    def _native_stems(structure):
+        buf = np.frombuffer(structure.encode(), dtype=np.uint8)
+        peers, closes, group_starts = _fold_native.find_stems(buf)
+        group_lengths = np.diff(group_starts, append=len(peers))
+        return buf, peers, closes, group_starts, group_lengths
+
+    @staticmethod
+    def stems_to_lists(peers, closes, group_starts, group_lengths):
+        peers, closes = peers.tolist(), closes.tolist()
+        return [(peers[b:b + n], closes[b:b + n])
+                for b, n in zip(group_starts.tolist(), group_lengths.tolist())]
+
+    @staticmethod
+    def find_stable_stems(folding):
+        if not _fold_native.NUMBA_AVAILABLE:
+            stems = FoldEvaluator.find_stems(folding)
+            return FoldEvaluator.unfold_unstable_structure(folding, stems)
+
+        # Lone pairs are dropped while the stems are still flat arrays, so
+        # only the stems that survive are converted to lists of positions.
+        buf, peers, closes, group_starts, group_lengths = (
+            FoldEvaluator._native_stems(folding))
+
+        lonepairs = group_starts[group_lengths == 1]
+        if len(lonepairs) > 0:
+            buf = buf.copy()
+            buf[peers[lonepairs]] = ord('.')
+            buf[closes[lonepairs]] = ord('.')
+            folding = buf.tobytes().decode('ascii')
+
+        stable = group_lengths > 1
+        return folding, FoldEvaluator.stems_to_lists(
+            peers, closes, group_starts[stable], group_lengths[stable])
+
+    @staticmethod
+    def count_loops(folding):
+        # Histogram of the lengths of unpaired runs spanning two or more bases
+        unpaired = np.frombuffer(folding.encode(), dtype=np.uint8) == ord('.')
+        edges = np.diff(unpaired.view(np.int8), prepend=0, append=0)
+        lengths = np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+        counts = np.bincount(lengths[lengths >= 2])
+        lengths = np.flatnonzero(counts)
+        return dict(zip(lengths.tolist(), counts[lengths].tolist()))
+
     @staticmethod
     def unfold_unstable_structure(folding, stems):
         # TODO: This needs to be revised based on the thermodynamic model of RNA
@@ -98,18 +169,25 @@ class FoldEvaluator:
         if not lonepairs:
             return folding, stems
 
-        folding = list(folding)
+        folding = bytearray(folding, 'ascii')
         for p5, p3 in lonepairs:
-            folding[p5[0]] = '.'
-            folding[p3[0]] = '.'
+            folding[p5[0]] = ord('.')
+            folding[p3[0]] = ord('.')
         newstems = [p for p in stems if len(p[0]) > 1]
 
-        return ''.join(folding), newstems
+        return folding.decode('ascii'), newstems
 
 
 class SequenceEvaluator:
 
+    __slots__ = ('scoring_funcs', 'scoreopts', 'execopts', 'length_cds',
+                 'mutantgen', 'species', 'quiet', 'foldeval', 'folding_cache',
+                 'result_cache', 'scorefuncs_nofolding', 'scorefuncs_folding',
+                 'annotationfuncs', 'penalty_metric_flags', 'local_evaluators',
+                 'sequence_annotators')
+
     folding_cache_size = 8192
+    result_cache_size = 8192
 
     def __init__(self, scoring_funcs, scoreopts, execopts, mutantgen, species,
                  length_cds, quiet):
@@ -127,7 +205,8 @@ class SequenceEvaluator:
 
     def initialize(self):
         self.foldeval = FoldEvaluator(self.execopts.folding_engine)
-        self.folding_cache = pylru.lrucache(self.folding_cache_size)
+        self.folding_cache = LRUCache(self.folding_cache_size)
+        self.result_cache = LRUCache(self.result_cache_size)
 
         self.scorefuncs_nofolding = []
         self.scorefuncs_folding = []
@@ -167,15 +246,38 @@ class SequenceEvaluator:
 
             self.penalty_metric_flags.update(cls.penalty_metric_flags)
 
-    def evaluate(self, seqs, executor):
-        with SequenceEvaluationSession(self, seqs, executor) as sess:
-            sess.evaluate()
+        # Resolve the optional per-sequence hooks once, in their original order.
+        self.local_evaluators = [
+            (fun.evaluate_local, fun.uses_folding)
+            for fun in self.annotationfuncs if hasattr(fun, 'evaluate_local')]
+        self.sequence_annotators = [
+            (fun.annotate_sequence, fun.uses_folding)
+            for fun in self.annotationfuncs if hasattr(fun, 'annotate_sequence')]
 
-            if not sess.errors:
-                total_scores = [sum(s.values()) for s in sess.scores]
-                return total_scores, sess.scores, sess.metrics, sess.foldings
-            else:
-                return None, None, None, None
+    def evaluate(self, seqs, executor):
+        # Survivors are carried over to the next generation unchanged, so only
+        # the sequences without a cached result go through the scoring
+        # functions, each distinct sequence once.
+        results = {}
+        for seq in seqs:
+            if seq not in results and seq in self.result_cache:
+                results[seq] = self.result_cache[seq]
+
+        newseqs = [seq for seq in dict.fromkeys(seqs) if seq not in results]
+        if newseqs:
+            with SequenceEvaluationSession(self, newseqs, executor) as sess:
+                sess.evaluate()
+
+                if sess.errors:
+                    return None, None, None, None
+
+                for seq, *result in zip(newseqs, sess.total_scores, sess.scores,
+                                        sess.metrics, sess.foldings):
+                    results[seq] = self.result_cache[seq] = tuple(result)
+
+        total_scores, scores, metrics, foldings = map(
+            list, zip(*[results[seq] for seq in seqs]))
+        return total_scores, scores, metrics, foldings
 
     def get_folding(self, seq):
         if seq not in self.folding_cache:
@@ -187,31 +289,41 @@ class SequenceEvaluator:
 
         seqevals = {}
         seqevals['local-metrics'] = localmet = {}
-        for fun in self.annotationfuncs:
-            if hasattr(fun, 'evaluate_local'):
-                if fun.uses_folding:
-                    localmet.update(fun.evaluate_local(seq, folding))
-                else:
-                    localmet.update(fun.evaluate_local(seq))
+        for evaluate_local, uses_folding in self.local_evaluators:
+            if uses_folding:
+                localmet.update(evaluate_local(seq, folding))
+            else:
+                localmet.update(evaluate_local(seq))
 
-            if hasattr(fun, 'annotate_sequence'):
-                if fun.uses_folding:
-                    seqevals.update(fun.annotate_sequence(seq, folding))
-                else:
-                    seqevals.update(fun.annotate_sequence(seq))
+        for annotate_sequence, uses_folding in self.sequence_annotators:
+            if uses_folding:
+                seqevals.update(annotate_sequence(seq, folding))
+            else:
+                seqevals.update(annotate_sequence(seq))
 
         return seqevals
 
 
 class SequenceEvaluationSession:
 
+    __slots__ = ('seqs', 'executor', 'score_columns', 'metric_columns',
+                 'scores', 'metrics', 'total_scores', 'foldings', 'errors',
+                 'folding_cache', 'foldings_remaining', 'foldeval', 'num_tasks',
+                 'pbar', 'quiet', 'scorefuncs_folding', 'scorefuncs_nofolding',
+                 'annotationfuncs')
+
     def __init__(self, evaluator: SequenceEvaluator, seqs: list[str],
                  executor: futures.Executor):
         self.seqs = seqs
         self.executor = executor
 
-        self.scores = [{} for i in range(len(seqs))]
-        self.metrics = [{} for i in range(len(seqs))]
+        # Results are gathered per key and turned into per-sequence dicts
+        # once all scoring functions have finished.
+        self.score_columns = {}
+        self.metric_columns = {}
+        self.scores = None
+        self.metrics = None
+        self.total_scores = None
         self.foldings = [None] * len(seqs)
         self.errors = []
 
@@ -272,14 +384,12 @@ class SequenceEvaluationSession:
             jobs.add(future)
 
         # Wait until all folding tasks are finished.
-        while jobs and not self.errors and self.foldings_remaining > 0:
-            done, jobs = futures.wait(jobs, timeout=0.1,
-                                      return_when=futures.FIRST_COMPLETED)
-            for future in done:
-                if future._type == 'folding':
-                    self.collect_folding(future)
-                elif future._type == 'scoring':
-                    self.collect_scores(future)
+        if not self.errors and self.foldings_remaining > 0:
+            for future in futures.as_completed(jobs):
+                jobs.remove(future)
+                self.collect_result(future)
+                if self.errors or self.foldings_remaining <= 0:
+                    break
 
         # Scoring functions requiring folding are executed.
         for scorefunc in self.scorefuncs_folding:
@@ -291,13 +401,34 @@ class SequenceEvaluationSession:
             future._type = 'scoring'
             jobs.add(future)
 
-        while jobs and not self.errors:
-            done, jobs = futures.wait(jobs, timeout=0.1)
-            for future in done:
-                if future._type == 'folding':
-                    self.collect_folding(future)
-                elif future._type == 'scoring':
-                    self.collect_scores(future)
+        if not self.errors:
+            for future in futures.as_completed(jobs):
+                self.collect_result(future)
+                if self.errors:
+                    break
+
+        self.scores = self.transpose_columns(self.score_columns)
+        self.metrics = self.transpose_columns(self.metric_columns)
+        self.total_scores = self.sum_columns(self.score_columns)
+
+    def transpose_columns(self, columns):
+        if not columns:
+            return [{} for i in range(len(self.seqs))]
+
+        names = list(columns)
+        return [dict(zip(names, row)) for row in zip(*columns.values())]
+
+    def sum_columns(self, columns):
+        if not columns:
+            return [0] * len(self.seqs)
+
+        return np.sum(list(columns.values()), axis=0).tolist()
+
+    def collect_result(self, future):
+        if future._type == 'folding':
+            self.collect_folding(future)
+        elif future._type == 'scoring':
+            self.collect_scores(future)
 
     def collect_scores(self, future):
         try:
@@ -317,15 +448,13 @@ class SequenceEvaluationSession:
 
         # Update scores
         for k, updates in scoreupdates.items():
-            assert len(updates) == len(self.scores)
-            for s, u in zip(self.scores, updates):
-                s[k] = u
+            assert len(updates) == len(self.seqs)
+            self.score_columns[k] = updates
 
         # Update metrics
         for k, updates in metricupdates.items():
-            assert len(updates) == len(self.metrics)
-            for s, u in zip(self.metrics, updates):
-                s[k] = u
+            assert len(updates) == len(self.seqs)
+            self.metric_columns[k] = updates
 
     def collect_folding(self, future):
         try:
@@ -347,16 +476,10 @@ class SequenceEvaluationSession:
             self.pbar.update()
 
     def handle_exception(self, exc):
-        import traceback
-        import io
-
-        errormsg = io.StringIO()
-        traceback.print_exc(file=errormsg)
-
         msg = [
             hbar_stars,
             'Error occurred in a scoring function:',
-            errormsg.getvalue(),
+            traceback.format_exc(),
             hbar_stars,
             '',
             'Termination in progress. Waiting for running tasks '